@@ -1,21 +1,29 @@
 import streamlit as st
 from typing import List
 import requests
-import json
+import orjson
 import time
 
+# =========================================================
+# SHARED HTTP SESSION (KEEP-ALIVE TO OLLAMA)
+# =========================================================
+@st.cache_resource
+def _http() -> requests.Session:
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=8)
+    session.mount("http://", adapter)
+    return session
+
 # =========================================================
 # GET LOCAL OLLAMA MODELS
 # =========================================================
+@st.cache_data(ttl=30, show_spinner=False)
 def get_ollama_models() -> List[str]:
-    try:
-        response = requests.get("http://localhost:11434/api/tags", timeout=5)
-        if response.status_code == 200:
-            models = response.json().get("models", [])
-            return [model["name"] for model in models]
-        return []
-    except:
-        return []
+    # Raises on failure so an unreachable server is never cached as "no models"
+    response = _http().get("http://localhost:11434/api/tags", timeout=5)
+    response.raise_for_status()
+    models = response.json().get("models", [])
+    return [model["name"] for model in models]
 
 # =========================================================
 # REAL-TIME STREAMING OLLAMA RESPONSE
@@ -31,79 +39,113 @@ def ollama_stream_answer(model: str, prompt: str):
             "stream": True
         }
 
-        response = requests.post(
+        response = _http().post(
             "http://localhost:11434/api/generate",
             json=payload,
             stream=True,
             timeout=60,
         )
 
-        full_text = ""
-
-        for line in response.iter_lines():
-            if not line:
-                continue
-            try:
-                json_data = json.loads(line.decode("utf-8"))
-                token = json_data.get("response", "")
-                full_text += token
-                yield token
-            except:
-                pass
-
-        return full_text
+        parts = []
+
+        # Split the NDJSON stream ourselves: iter_lines() holds back the
+        # final line until the next chunk arrives.
+        try:
+            buf = b""
+            for chunk in response.iter_content(chunk_size=4096):
+                if not chunk:
+                    continue
+                buf += chunk
+                while b"\n" in buf:
+                    line, buf = buf.split(b"\n", 1)
+                    if not line:
+                        continue
+                    try:
+                        json_data = orjson.loads(line)
+                        token = json_data.get("response", "")
+                        if token:
+                            parts.append(token)
+                            yield token
+                    except ValueError:
+                        pass
+            if buf.strip():
+                try:
+                    token = orjson.loads(buf).get("response", "")
+                    if token:
+                        parts.append(token)
+                        yield token
+                except ValueError:
+                    pass
+        finally:
+            response.close()
+
+        return "".join(parts)
 
     except Exception as e:
         yield f"[Streaming error: {e}]"
 
 # =========================================================
-# NON-STREAM PROVIDERS (OPENAI / GEMINI)
+# STREAMING CLOUD PROVIDERS (OPENAI / GEMINI)
 # =========================================================
-def openai_answer(model: str, prompt: str) -> str:
-    import openai
-
+def openai_stream_answer(model: str, prompt: str):
+    """
+    Stream tokens from OpenAI instead of waiting for the whole completion.
+    """
     api_key = st.session_state.get("openai_key")
     if not api_key:
-        return "[OpenAI error: Missing API key]"
+        yield "[OpenAI error: Missing API key]"
+        return
 
-    openai.api_key = api_key
+    import openai
 
     try:
         result = openai.ChatCompletion.create(
+            api_key=api_key,
             model=model,
             messages=[{"role": "user", "content": prompt}],
-            max_tokens=200
+            max_tokens=200,
+            stream=True
         )
-        return result.choices[0].message["content"]
+        for chunk in result:
+            token = chunk.choices[0].delta.get("content", "")
+            if token:
+                yield token
     except Exception as e:
-        return f"[OpenAI error: {e}]"
-
-def gemini_answer(model: str, prompt: str) -> str:
-    import google.generativeai as genai
+        yield f"[OpenAI error: {e}]"
 
+def gemini_stream_answer(model: str, prompt: str):
+    """
+    Stream tokens from Gemini instead of waiting for the whole completion.
+    """
     api_key = st.session_state.get("gemini_key")
     if not api_key:
-        return "[Gemini error: Missing API key]"
+        yield "[Gemini error: Missing API key]"
+        return
+
+    import google.generativeai as genai
 
+    # configure() is process-wide, so set this session's key right before the call
     genai.configure(api_key=api_key)
 
     try:
         gmodel = genai.GenerativeModel(model)
-        response = gmodel.generate_content(prompt)
-        return response.text
+        for chunk in gmodel.generate_content(prompt, stream=True):
+            if chunk.text:
+                yield chunk.text
     except Exception as e:
-        return f"[Gemini error: {e}]"
+        yield f"[Gemini error: {e}]"
 
 # =========================================================
 # MAIN ROUTER
 # =========================================================
 def generate_ai_response(provider: str, model: str, prompt: str):
+    # Every provider yields tokens, so main() can render the first one immediately
     if provider == "Ollama":
-        return ollama_stream_answer(model, prompt)  # streamed generator
+        return ollama_stream_answer(model, prompt)
     elif provider == "OpenAI":
-        return [openai_answer(model, prompt)]  # single-shot list for uniformity
+        return openai_stream_answer(model, prompt)
     elif provider == "Gemini":
-        return [gemini_answer(model, prompt)]
+        return gemini_stream_answer(model, prompt)
     else:
         return ["Unknown provider."]
 
@@ -142,7 +184,10 @@ def provider_settings_interface():
         )
 
     elif provider == "Ollama":
-        models = get_ollama_models()
+        try:
+            models = get_ollama_models()
+        except Exception:
+            models = []
         if models:
             st.session_state["model"] = st.sidebar.selectbox("Model", models)
         else:
@@ -172,16 +217,27 @@ def main():
 
             # Create placeholder for streaming output
             placeholder = st.empty()
-            streamed_reply = ""
+            chunks = []
 
             start_time = time.perf_counter()
+            last_render = start_time
+            pending = 0
             for token in generate_ai_response(
                 st.session_state.provider,
                 st.session_state.model,
                 user_input
             ):
-                streamed_reply += token
-                placeholder.markdown(f"**Assistant:** {streamed_reply}")
+                chunks.append(token)
+                pending += len(token)
+                # Re-render at most ~20 times a second instead of per token
+                now = time.perf_counter()
+                if now - last_render > 0.05 or pending > 32:
+                    streamed_reply = "".join(chunks)
+                    placeholder.markdown(f"**Assistant:** {streamed_reply}")
+                    last_render = now
+                    pending = 0
+            streamed_reply = "".join(chunks)
+            placeholder.markdown(f"**Assistant:** {streamed_reply}")
             response_time = time.perf_counter() - start_time
 
             # Save final full message with response time
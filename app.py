@@ -2,17 +2,18 @@
 """
 Suggestion: This file implements a Streamlit-based UI for monitoring and chatting with Ollama and other LLM providers (ChatGPT, Gemini).
 It features dynamic sidebar controls, real-time system/resource monitoring, model selection, multi-model chat, and visualizations (usage/memory charts).
-It uses subprocess to call Ollama CLI for model status and presents data interactively.
+It uses the Ollama CLI and HTTP API for model status and presents data interactively.
 """
 
-import subprocess
 import re
+import subprocess
 import time
 from datetime import datetime
 import requests
+import orjson
 import pandas as pd
 import streamlit as st
-import matplotlib.pyplot as plt
+import plotly.express as px
 
 # ---------------- Page config ----------------
 st.set_page_config(
@@ -22,10 +23,32 @@ st.set_page_config(
 )
 
 # ---------------- Regex Patterns ----------------
-PCT_RE = re.compile(r"(\d+)%/(\d+)%")
-GB_RE = re.compile(r"(\d+(?:\.\d+)?)\s*GB", re.IGNORECASE)
+# One pass over `ollama ps` rows: name, id, optional size + unit, and either a
+# CPU%/GPU% split or a single "N% CPU" / "N% GPU" processor column
+PS_LINE_RE = re.compile(
+    r"^(?P<name>\S+)[ \t]+(?P<id>\S+)"
+    r"(?:[ \t]+(?P<size>\d+(?:\.\d+)?)[ \t]*(?P<unit>[KMGT]?B)\b)?"
+    r"(?:[^\n]*?(?:(?P<cpu>\d+)%/(?P<gpu>\d+)%|(?P<pct>\d+)%[ \t]+(?P<proc>CPU|GPU)))?",
+    re.MULTILINE | re.IGNORECASE
+)
+# `ollama ps` prints decimal (1000-based) units
+UNIT_TO_GB = {"B": 1e-9, "KB": 1e-6, "MB": 1e-3, "GB": 1.0, "TB": 1e3}
+
+# ---------------- Chat limits ----------------
+MAX_HISTORY_MESSAGES = 20   # most recent messages sent to the model per turn
+MAX_HISTORY_CHARS = 8000    # drop oldest messages beyond this total length
 
 # ---------------- Generic Helpers ----------------
+@st.cache_resource
+def _http():
+    """
+    Shared requests.Session so Ollama calls reuse keep-alive connections.
+    """
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=8)
+    session.mount("http://", adapter)
+    return session
+
 def run_cmd(cmd):
     """
     Run a system command safely and return output as string.
@@ -36,14 +59,15 @@ def run_cmd(cmd):
     except Exception:
         return ""
 
+@st.cache_data(ttl=30, show_spinner=False)
 def list_ollama_models():
     """
     Extract model names from `ollama list` CLI output.
+    Cached for 30s so reruns don't fork the CLI each time; raises if the
+    CLI fails so an unavailable server is never cached as "no models".
     """
-    out = run_cmd(["ollama", "list"])
-    if not out:
-        return []
-    rows = out.splitlines()[1:]  # skip header
+    p = subprocess.run(["ollama", "list"], capture_output=True, text=True, check=True)
+    rows = p.stdout.strip().splitlines()[1:]  # skip header
     models = []
     for r in rows:
         parts = r.split()
@@ -51,38 +75,69 @@ def list_ollama_models():
             models.append(parts[0])
     return models
 
+def _parse_ollama_ps_cli():
+    """
+    Fallback for servers without `/api/ps`: scan `ollama ps` CLI output once.
+    """
+    out = run_cmd(["ollama", "ps"])
+    if "\n" not in out:
+        return []
+    body = out.split("\n", 1)[1]  # skip header
+    parsed = []
+    for m in PS_LINE_RE.finditer(body):
+        size_gb = 0.0
+        if m.group("size"):
+            size_gb = float(m.group("size")) * UNIT_TO_GB[m.group("unit").upper()]
+        if m.group("pct"):
+            pct = int(m.group("pct"))
+            cpu, gpu = (pct, 100 - pct) if m.group("proc").upper() == "CPU" else (100 - pct, pct)
+        else:
+            cpu = int(m.group("cpu") or 0)
+            gpu = int(m.group("gpu") or 0)
+        parsed.append({
+            "name": m.group("name"),
+            "id": m.group("id"),
+            "size_gb": size_gb,
+            "size_gb_disp": f"{size_gb:.2f}",
+            "cpu_pct": cpu,
+            "gpu_pct": gpu,
+            "raw": m.group(0)
+        })
+    return parsed
+
+@st.cache_data(ttl=2, show_spinner=False)
 def parse_ollama_ps():
     """
-    Parse `ollama ps` CLI output to extract fields:
+    Query the Ollama `/api/ps` endpoint (falling back to `ollama ps`) for
+    running models and extract fields:
         - model name
         - model id
-        - memory GB
+        - memory GB (float for charts, pre-formatted string for the table)
         - CPU %
         - GPU %
+    Cached for 2s so live-monitor reruns hit the cache, not the server.
     """
-    out = run_cmd(["ollama", "ps"])
-    if not out:
-        return []
-    lines = out.splitlines()[1:]  # Skip header
+    try:
+        r = _http().get("http://localhost:11434/api/ps", timeout=5)
+        r.raise_for_status()
+        models = r.json().get("models", [])
+    except Exception:
+        return _parse_ollama_ps_cli()
     parsed = []
-    for line in lines:
-        parts = line.split()
-        if len(parts) < 2:
-            continue
-        name = parts[0]
-        model_id = parts[1]
-        m_gb = GB_RE.search(line)
-        size_gb = float(m_gb.group(1)) if m_gb else 0
-        m_pct = PCT_RE.search(line)
-        cpu = int(m_pct.group(1)) if m_pct else 0
-        gpu = int(m_pct.group(2)) if m_pct else 0
+    for m in models:
+        size = m.get("size", 0) or 0
+        size_vram = m.get("size_vram", 0) or 0
+        # Same CPU/GPU split `ollama ps` derives for its PROCESSOR column
+        gpu = round(100 * size_vram / size) if size else 0
+        cpu = 100 - gpu if size else 0
         parsed.append({
-            "name": name,
-            "id": model_id,
-            "size_gb": size_gb,
+            "name": m.get("name", ""),
+            "id": m.get("digest", "")[:12],
+            "size_gb": size / 1e9,
+            "size_gb_disp": f"{size / 1e9:.2f}",
             "cpu_pct": cpu,
             "gpu_pct": gpu,
-            "raw": line
+            "raw": m
         })
     return parsed
 
@@ -97,9 +152,9 @@ def call_ollama_chat(model, messages, timeout=120):
 
     t0 = time.perf_counter()
     try:
-        r = requests.post(url, json=payload, timeout=timeout)
+        r = _http().post(url, json=payload, timeout=timeout)
         r.raise_for_status()
-        j = r.json()
+        j = orjson.loads(r.content)
         reply = j.get("message", {}).get("content", "")
         if not reply or "context" in reply.lower():
             reply = (
@@ -121,17 +176,48 @@ def export_tags_to_ollama():
     """
     url = "http://localhost:11434/api/tags"
     try:
-        r = requests.get(url, timeout=10)
+        r = _http().get(url, timeout=10)
         r.raise_for_status()
         return True, r.json()
     except Exception:
         try:
-            r = requests.post(url, json={}, timeout=10)
+            r = _http().post(url, json={}, timeout=10)
             r.raise_for_status()
             return True, r.json()
         except Exception as e:
             return False, str(e)
 
+@st.cache_data(max_entries=32, show_spinner=False)
+def _usage_fig(rows):
+    """
+    Grouped CPU/GPU bar per model; `rows` is a tuple of (name, cpu_pct, gpu_pct, size_gb).
+    """
+    df = pd.DataFrame(rows, columns=["name", "CPU Usage (%)", "GPU Usage (%)", "size_gb"])
+    long_df = df.melt(
+        id_vars="name",
+        value_vars=["CPU Usage (%)", "GPU Usage (%)"],
+        var_name="metric", value_name="value"
+    )
+    fig = px.bar(
+        long_df, x="name", y="value", color="metric", barmode="group",
+        color_discrete_sequence=['#1f77b4', '#ff7f0e'],
+        labels={"name": "Model", "value": "Usage (%)", "metric": ""}
+    )
+    fig.update_yaxes(range=[0, 100])
+    return fig
+
+@st.cache_data(max_entries=32, show_spinner=False)
+def _memory_fig(rows):
+    """
+    Memory split pie across models, pulling out the largest consumer.
+    """
+    df = pd.DataFrame(rows, columns=["name", "cpu_pct", "gpu_pct", "size_gb"])
+    sizes = df["size_gb"].tolist()
+    highlight = [0.10 if i == sizes.index(max(sizes)) else 0 for i in range(len(sizes))]
+    fig = px.pie(df, names="name", values="size_gb", title="Memory Use")
+    fig.update_traces(pull=highlight, hovertemplate="%{label}: %{value:.2f} GB")
+    return fig
+
 # ---------------- Session state ----------------
 # Set up basic Streamlit session state variables for multi-model chat, monitoring and provider selection.
 if "messages" not in st.session_state:
@@ -157,7 +243,11 @@ with st.sidebar:
     st.session_state.provider = provider
 
     if provider == "Ollama":
-        models = list_ollama_models() or ["(No local models)"]
+        try:
+            models = list_ollama_models()
+        except Exception:
+            models = []
+        models = models or ["(No local models)"]
     elif provider == "ChatGPT":
         st.text_input("OpenAI API Key", type="password", key="openai_key")
         models = ["gpt-4o", "gpt-4.1", "gpt-4.1-mini"]
@@ -184,6 +274,8 @@ with st.sidebar:
     st.session_state.live_monitor = st.checkbox("Enable monitor", value=st.session_state.live_monitor)
 
     if st.button("Snapshot now"):
+        list_ollama_models.clear()
+        parse_ollama_ps.clear()
         st.rerun()
 
     st.markdown("---")
@@ -220,9 +312,13 @@ with col_chat:
         if user_input:
             st.session_state.multi_model_msgs[model].append({"role": "user", "content": user_input})
 
+            # Only send a sliding window of recent turns to keep the prompt small
+            history = st.session_state.multi_model_msgs[model][-MAX_HISTORY_MESSAGES:]
+            while len(history) > 1 and sum(len(m["content"]) for m in history) > MAX_HISTORY_CHARS:
+                history = history[1:]
             backend_messages = [
                 {"role": m["role"], "content": m["content"]}
-                for m in st.session_state.multi_model_msgs[model]
+                for m in history
             ]
 
             if provider == "Ollama":
@@ -236,7 +332,10 @@ with col_chat:
             st.rerun()
 
 # ---------------- Monitor UI ----------------
-with col_monitor:
+# The monitor is a fragment: with live monitoring on, only this panel re-runs
+# every 2s, so the chat column and its history are not replayed on each tick.
+@st.fragment(run_every=2 if st.session_state.live_monitor else None)
+def monitor_panel(model_selection):
     st.header("📊 System Monitor")
     st.write("Real-time performance metrics from **Ollama**.")
 
@@ -247,74 +346,30 @@ with col_monitor:
         st.info("⚠️ No selected models running. Start one using `ollama run <model>` to see system usage.")
     else:
         # --- Table of active models ---
-        df = pd.DataFrame(filtered_rows)
         st.markdown("#### Active Model(s) Table")
-        st.dataframe(
-            df[["name", "id", "size_gb", "cpu_pct", "gpu_pct"]].rename(
-                columns={
-                    "name": "Name", "id": "ID",
-                    "size_gb": "Memory (GB)",
-                    "cpu_pct": "CPU (%)",
-                    "gpu_pct": "GPU (%)"
-                }
-            ),
-            hide_index=True
+        st.dataframe([
+            {
+                "Name": r["name"], "ID": r["id"],
+                "Memory (GB)": r["size_gb_disp"],
+                "CPU (%)": r["cpu_pct"],
+                "GPU (%)": r["gpu_pct"]
+            }
+            for r in filtered_rows
+        ], hide_index=True)
+
+        # --- Charts for system resource usage ---
+        # Immutable snapshot of the metrics so unchanged reruns hit the figure cache
+        rows_key = tuple(
+            (r["name"], r["cpu_pct"], r["gpu_pct"], r["size_gb"]) for r in filtered_rows
         )
 
-        # --- Pie charts for system resource usage ---
         # CPU/GPU Usage per model
         st.subheader("📌 Current Utilization (per model)")
-        labels = ['CPU Usage (%)', 'GPU Usage (%)']
-        colors = ['#1f77b4', '#ff7f0e']
-        n = len(filtered_rows)
-        fig, axs = plt.subplots(1, n, figsize=(4*n, 3))
-        if n == 1:
-            axs = [axs]
-        for idx, r in enumerate(filtered_rows):
-            ax = axs[idx]
-            cpu_val = r['cpu_pct'] or 0
-            gpu_val = r['gpu_pct'] or 0
-            chart_vals = [cpu_val if cpu_val > 0 else 1e-6, gpu_val if gpu_val > 0 else 1e-6]
-            wedges, texts, autotexts = ax.pie(
-                chart_vals, labels=labels, autopct='%1.1f%%', colors=colors,
-                startangle=90, textprops=dict(color="w")
-            )
-            ax.axis('equal')
-            plt.setp(autotexts, size=10, weight="bold")
-            plt.setp(texts, size=10)
-            ax.set_title(f"{r['name']} (Usage)", fontsize=11)
-        plt.tight_layout()
-        st.pyplot(fig)
-        plt.close(fig)
+        st.plotly_chart(_usage_fig(rows_key), use_container_width=True)
 
         # Memory use pie chart across selected models (highlight largest consumer)
         st.subheader("🧠 Memory Split (across selected models)")
-        sizes = [r['size_gb'] for r in filtered_rows]
-        mlabs = [r['name'] for r in filtered_rows]
-        highlight = [0.10 if i == sizes.index(max(sizes)) else 0 for i in range(len(sizes))]
-        fig2, ax2 = plt.subplots(figsize=(3.5, 3.5))
-        patches, texts, autotexts = ax2.pie(
-            sizes,
-            labels=mlabs,
-            explode=highlight,
-            autopct=lambda pct: f"{pct:.1f}%" if pct > 1 else '',
-            colors=plt.cm.Paired.colors,
-            startangle=100,
-            textprops=dict(color="w")
-        )
-        ax2.axis('equal')
-        plt.setp(autotexts, size=10, weight="bold")
-        plt.setp(texts, size=10)
-        ax2.legend(
-            patches, 
-            [f"{mlabs[i]}: {sizes[i]:.2f} GB" for i in range(len(sizes))],
-            loc="lower left", bbox_to_anchor=(1, 0.5),
-            title="Memory Use"
-        )
-        st.pyplot(fig2)
-        plt.close(fig2)
+        st.plotly_chart(_memory_fig(rows_key), use_container_width=True)
 
-# Auto-refresh when live monitoring is active
-if st.session_state.live_monitor:
-    time.sleep(2)
-    st.rerun()
+with col_monitor:
+    monitor_panel(model_selection)
@@ -1,6 +1,11 @@
 import os
+import threading
+from contextlib import contextmanager
+from functools import lru_cache
 import psycopg2
+import psycopg2.extensions
 import psycopg2.extras
+import psycopg2.pool
 from typing import List, Dict, Optional
 import logging
 
@@ -8,27 +13,127 @@ import logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Connection pool shared by all helpers, created on first use
+_POOL: Optional[psycopg2.pool.ThreadedConnectionPool] = None
+_POOL_LOCK = threading.Lock()
+
+# Hot queries prepared once per pooled connection so the server skips re-planning
+_PREPARED_STATEMENTS = {
+    "save_msg_stmt": """
+        PREPARE save_msg_stmt (uuid, varchar, text) AS
+        WITH new_msg AS (
+            INSERT INTO messages (conversation_id, role, content)
+            VALUES ($1, $2, $3)
+            RETURNING id
+        )
+        UPDATE conversations
+        SET updated_at = CURRENT_TIMESTAMP
+        WHERE id = $1
+        RETURNING (SELECT id FROM new_msg) AS mid;
+    """,
+    "get_msgs_stmt": """
+        PREPARE get_msgs_stmt (uuid) AS
+        SELECT id, conversation_id, role, content, created_at
+        FROM messages
+        WHERE conversation_id = $1
+        ORDER BY created_at ASC;
+    """,
+    "list_convs_stmt": """
+        PREPARE list_convs_stmt (int) AS
+        SELECT id, title, provider, model, created_at, updated_at
+        FROM conversations
+        ORDER BY updated_at DESC
+        LIMIT $1;
+    """,
+}
+
+class _PooledConnection(psycopg2.extensions.connection):
+    """Connection that remembers which statements it has prepared"""
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.prepared_statements = set()
+
+def _connection_params() -> Dict:
+    """YugabyteDB connection settings from the environment"""
+    return dict(
+        host=os.getenv('YUGABYTE_HOST', 'us-east-1.caf91660-4797-4dec-91fd-a282ebb4037b.aws.yugabyte.cloud'),
+        port=int(os.getenv('YUGABYTE_PORT', '5433')),
+        database=os.getenv('YUGABYTE_DB', 'yugabyte'),
+        user=os.getenv('YUGABYTE_USER', 'admin'),
+        password=os.getenv('YUGABYTE_PASSWORD', 'cXgvtpIzCjd2yfjoTW-ed8TFhqP3qi'),
+        connect_timeout=10
+    )
+
 def get_db_connection():
     """Establish connection to YugabyteDB"""
     try:
-        connection = psycopg2.connect(
-            host=os.getenv('YUGABYTE_HOST', 'us-east-1.caf91660-4797-4dec-91fd-a282ebb4037b.aws.yugabyte.cloud'),
-            port=int(os.getenv('YUGABYTE_PORT', '5433')),
-            database=os.getenv('YUGABYTE_DB', 'yugabyte'),
-            user=os.getenv('YUGABYTE_USER', 'admin'),
-            password=os.getenv('YUGABYTE_PASSWORD', 'cXgvtpIzCjd2yfjoTW-ed8TFhqP3qi'),
-            connect_timeout=10
-        )
+        connection = psycopg2.connect(**_connection_params())
         logger.info("Database connection established successfully")
         return connection
     except Exception as e:
         logger.error(f"Database connection failed: {e}")
         raise
 
+def get_db_pool() -> psycopg2.pool.ThreadedConnectionPool:
+    """Return the shared connection pool, creating it on first use"""
+    global _POOL
+    if _POOL is None:
+        with _POOL_LOCK:
+            if _POOL is None:
+                try:
+                    _POOL = psycopg2.pool.ThreadedConnectionPool(
+                        1, 8, connection_factory=_PooledConnection, **_connection_params()
+                    )
+                    logger.info("Database connection pool created successfully")
+                except Exception as e:
+                    logger.error(f"Database connection pool creation failed: {e}")
+                    raise
+    return _POOL
+
+@contextmanager
+def _conn():
+    """Check a connection out of the pool, commit on success and return it"""
+    pool = get_db_pool()
+    conn = pool.getconn()
+    try:
+        yield conn
+        conn.commit()
+    except Exception:
+        # A dead connection can't roll back; let the original error propagate
+        if not conn.closed:
+            try:
+                conn.rollback()
+            except psycopg2.Error:
+                pass
+        raise
+    finally:
+        # Discard broken connections instead of handing them to the next caller
+        pool.putconn(conn, close=bool(conn.closed))
+
+def _execute_prepared(cursor, name: str, args: tuple) -> None:
+    """EXECUTE a hot statement, sending its PREPARE in the same round-trip on first use"""
+    conn = cursor.connection
+    if conn.prepared_statements is None:
+        # A previous call failed, so re-read what the server actually has prepared
+        with conn.cursor() as sync_cursor:
+            sync_cursor.execute("SELECT name FROM pg_prepared_statements;")
+            conn.prepared_statements = {row[0] for row in sync_cursor.fetchall()}
+    placeholders = ", ".join(["%s"] * len(args))
+    execute_sql = f"EXECUTE {name} ({placeholders});"
+    sql = execute_sql if name in conn.prepared_statements else _PREPARED_STATEMENTS[name] + execute_sql
+    try:
+        cursor.execute(sql, args)
+    except Exception:
+        # Server-side state may no longer match (failed PREPARE, session reset,
+        # transaction pooler), so resync from pg_prepared_statements next time
+        conn.prepared_statements = None
+        raise
+    conn.prepared_statements.add(name)
+
 def initialize_database():
     """Create database tables and indexes if they don't exist"""
     try:
-        with get_db_connection() as conn:
+        with _conn() as conn:
             with conn.cursor() as cursor:
                 # Create conversations table
                 cursor.execute("""
@@ -78,10 +183,17 @@ def initialize_database():
         raise
 
 # Conversation operations
-def create_conversation(title: str, provider: str, model: str) -> str:
-    """Create a new conversation and return its ID"""
+def create_conversation(title: str, provider: str, model: str,
+                        first_user_message: Optional[str] = None) -> str:
+    """Create a new conversation and return its ID
+
+    If no title is given, it is derived once from `first_user_message` and
+    stored on the row, so listings never need to scan messages for it.
+    """
+    if not title and first_user_message:
+        title = _title_from_first(first_user_message)
     try:
-        with get_db_connection() as conn:
+        with _conn() as conn:
             with conn.cursor() as cursor:
                 cursor.execute("""
                     INSERT INTO conversations (title, provider, model)
@@ -99,14 +211,9 @@ def create_conversation(title: str, provider: str, model: str) -> str:
 def get_conversations(limit: int = 50) -> List[Dict]:
     """Get list of recent conversations"""
     try:
-        with get_db_connection() as conn:
+        with _conn() as conn:
             with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cursor:
-                cursor.execute("""
-                    SELECT id, title, provider, model, created_at, updated_at
-                    FROM conversations
-                    ORDER BY updated_at DESC
-                    LIMIT %s;
-                """, (limit,))
+                _execute_prepared(cursor, "list_convs_stmt", (limit,))
                 conversations = cursor.fetchall()
                 return [dict(conv) for conv in conversations]
     except Exception as e:
@@ -116,7 +223,7 @@ def get_conversations(limit: int = 50) -> List[Dict]:
 def get_conversation(conversation_id: str) -> Optional[Dict]:
     """Get a specific conversation by ID"""
     try:
-        with get_db_connection() as conn:
+        with _conn() as conn:
             with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cursor:
                 cursor.execute("""
                     SELECT id, title, provider, model, created_at, updated_at
@@ -132,7 +239,7 @@ def get_conversation(conversation_id: str) -> Optional[Dict]:
 def update_conversation_title(conversation_id: str, title: str) -> bool:
     """Update conversation title"""
     try:
-        with get_db_connection() as conn:
+        with _conn() as conn:
             with conn.cursor() as cursor:
                 cursor.execute("""
                     UPDATE conversations
@@ -148,7 +255,7 @@ def update_conversation_title(conversation_id: str, title: str) -> bool:
 def delete_conversation(conversation_id: str) -> bool:
     """Delete a conversation and all its messages"""
     try:
-        with get_db_connection() as conn:
+        with _conn() as conn:
             with conn.cursor() as cursor:
                 cursor.execute("DELETE FROM conversations WHERE id = %s;", (conversation_id,))
                 conn.commit()
@@ -161,22 +268,12 @@ def delete_conversation(conversation_id: str) -> bool:
 def save_message(conversation_id: str, role: str, content: str) -> str:
     """Save a message and return its ID"""
     try:
-        with get_db_connection() as conn:
+        with _conn() as conn:
             with conn.cursor() as cursor:
-                cursor.execute("""
-                    INSERT INTO messages (conversation_id, role, content)
-                    VALUES (%s, %s, %s)
-                    RETURNING id;
-                """, (conversation_id, role, content))
+                # Insert the message and bump the conversation timestamp in one round-trip
+                _execute_prepared(cursor, "save_msg_stmt", (conversation_id, role, content))
                 message_id = cursor.fetchone()[0]
 
-                # Update conversation timestamp
-                cursor.execute("""
-                    UPDATE conversations
-                    SET updated_at = CURRENT_TIMESTAMP
-                    WHERE id = %s;
-                """, (conversation_id,))
-
                 conn.commit()
                 return str(message_id)
     except Exception as e:
@@ -186,20 +283,50 @@ def save_message(conversation_id: str, role: str, content: str) -> str:
 def get_messages(conversation_id: str) -> List[Dict]:
     """Get all messages for a conversation"""
     try:
-        with get_db_connection() as conn:
+        with _conn() as conn:
             with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cursor:
-                cursor.execute("""
-                    SELECT id, conversation_id, role, content, created_at
-                    FROM messages
-                    WHERE conversation_id = %s
-                    ORDER BY created_at ASC;
-                """, (conversation_id,))
+                _execute_prepared(cursor, "get_msgs_stmt", (conversation_id,))
                 messages = cursor.fetchall()
                 return [dict(msg) for msg in messages]
     except Exception as e:
         logger.error(f"Failed to get messages for conversation {conversation_id}: {e}")
         return []
 
+def get_messages_for_many(conversation_ids: List[str]) -> Dict[str, List[Dict]]:
+    """Get messages for several conversations in one query, grouped by conversation ID"""
+    if not conversation_ids:
+        return {}
+    try:
+        with _conn() as conn:
+            with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cursor:
+                cursor.execute("""
+                    SELECT id, conversation_id, role, content, created_at
+                    FROM messages
+                    WHERE conversation_id = ANY(%s::uuid[])
+                    ORDER BY conversation_id, created_at ASC;
+                """, (list(conversation_ids),))
+                grouped: Dict[str, List[Dict]] = {str(cid): [] for cid in conversation_ids}
+                for msg in cursor:
+                    grouped.setdefault(str(msg['conversation_id']), []).append(dict(msg))
+                return grouped
+    except Exception as e:
+        logger.error(f"Failed to get messages for {len(conversation_ids)} conversations: {e}")
+        return {}
+
+@lru_cache(maxsize=1024)
+def _title_from_first_line(first_line: str) -> str:
+    """Title for a conversation given the first line of its first user message"""
+    # Take first 50 characters of the first line
+    title = first_line[:50]
+    if len(title) < len(first_line):
+        title += "..."
+    return title or "New Conversation"
+
+def _title_from_first(first_user_content: str) -> str:
+    """Title for a conversation given its first user message"""
+    # Only the first line is used, so only it is kept as the cache key
+    return _title_from_first_line(first_user_content.strip().split('\n', 1)[0])
+
 def generate_conversation_title(messages: List[Dict]) -> str:
     """Generate a title from the first user message"""
     if not messages:
@@ -208,11 +335,6 @@ def generate_conversation_title(messages: List[Dict]) -> str:
     # Find the first user message
     for msg in messages:
         if msg['role'] == 'user':
-            content = msg['content'].strip()
-            # Take first 50 characters or first line
-            title = content.split('\n')[0][:50]
-            if len(title) < len(content.split('\n')[0]):
-                title += "..."
-            return title or "New Conversation"
+            return _title_from_first(msg['content'])
 
     return "New Conversation"